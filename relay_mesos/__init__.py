@@ -1,14 +1,19 @@
 import logging
 log = logging.getLogger('relay.mesos')
 
+__all__ = ['log', 'configure_logging', '__version__']
+
 # expose configure_logging to those who wish to develop relay
 from relay import configure_logging
 
 from relay import log as _relay_runner_log
-_parent_log = logging.getLogger('relay')
 _relay_runner_log.propagate = True
 log.propagate = True
-configure_logging(True, log=_parent_log)  # parent_log will not propagate
 
-import pkg_resources as _pkg_resources
-__version__ = _pkg_resources.get_distribution('relay.mesos').version
+try:
+    from importlib.metadata import version as _version
+except ImportError:  # python < 3.8
+    import pkg_resources as _pkg_resources
+    __version__ = _pkg_resources.get_distribution('relay.mesos').version
+else:
+    __version__ = _version('relay.mesos')
@@ -1,3 +1,4 @@
+from itertools import repeat
 import json
 import os
 import urllib2
@@ -21,5 +22,6 @@ def target_value():
     An example target used by the relay.mesos demo to set the target number of
     currently running tasks at a given point in time
     """
-    while True:
-        yield 40  # you could have any arbitrary logic you wish here...
+    # you could have any arbitrary logic you wish here, ie. a generator that
+    # yields a new target each time Relay asks for one
+    return repeat(40)
@@ -1,46 +1,84 @@
 import atexit
+import copy
 import multiprocessing as mp
 import json
+import logging
+import os
+import Queue
 import signal
 import sys
-import time
 
+from mesos.interface import mesos_pb2
 from relay import argparse_shared as at
 from relay.runner import main as relay_main, build_arg_parser as relay_ap
-from relay_mesos import log
+from relay_mesos import log, configure_logging
 from relay_mesos.util import catch
 from relay_mesos.scheduler import Scheduler
 
+# import the native bindings once, here, rather than in the scheduler process
+# after it forks.  If they're missing, the scheduler process raises the error.
+try:
+    import mesos.native
+except ImportError as err:
+    MESOS_NATIVE_IMPORT_ERROR = err
+else:
+    MESOS_NATIVE_IMPORT_ERROR = None
 
-def warmer_cooler_wrapper(MV, ns):
+
+def warmer_cooler_wrapper(MV, ns, task_type):
     """
     Act as a warmer or cooler function such that, instead of executing code,
     we ask mesos to execute it.
+
+    `task_type` either "warmer" or "cooler"
     """
     def _warmer_cooler_wrapper(n):
-        # inform mesos that it should spin up n tasks of type f, where f is
-        # either the warmer or cooler.  Since Relay assumes that the choice of
-        # `f` (either a warmer or cooler func) is determined by the sign of n,
-        # we can too!
+        # inform mesos that it should spin up n tasks of type `task_type`.
+        # Relay passes a positive n to the warmer and a negative n to the
+        # cooler, so only the magnitude of n matters.
         log.debug(
             'asking mesos to spawn tasks',
             extra=dict(
                 mesos_framework_name=ns.mesos_framework_name,
-                task_num=n, task_type="warmer" if n > 0 else "cooler"))
-        t = time.time()
-        with MV.get_lock():
-            if MV[1] < t:
-                MV[:] = (n, t)
+                task_num=n, task_type=task_type))
+        MV.put((task_type, abs(n)))
         log.debug(
             '...finished asking mesos to spawn tasks',
             extra=dict(
                 mesos_framework_name=ns.mesos_framework_name,
-                task_num=n, task_type="warmer" if n > 0 else "cooler"))
+                task_num=n, task_type=task_type))
     return _warmer_cooler_wrapper
 
 
+def kill_process_group(proc, timeout=2):
+    """
+    Terminate a child process and everything it spawned.
+
+    Each child makes itself a process group leader, so SIGTERM the whole
+    group and, if the child hasn't exited within `timeout` seconds, SIGKILL
+    it.
+    """
+    if proc.pid is None:
+        return  # never started
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+    except OSError:
+        # the child may not have called os.setpgrp() yet
+        proc.terminate()
+    proc.join(timeout)
+    if proc.is_alive():
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except OSError:
+            os.kill(proc.pid, signal.SIGKILL)
+
+
 def set_signals(mesos, relay, ns):
-    """Kill child processes on sigint or sigterm"""
+    """Kill child processes on sigint or sigterm
+
+    Call this before starting the children.  They inherit these handlers and
+    must reset them with reset_signals()
+    """
     def kill_children(signal, frame):
         log.error(
             'Received a signal that is trying to terminate this process.'
@@ -48,7 +86,7 @@ def set_signals(mesos, relay, ns):
                 mesos_framework_name=ns.mesos_framework_name,
                 signal=signal))
         try:
-            mesos.terminate()
+            kill_process_group(mesos)
             log.info(
                 'terminated mesos scheduler',
                 extra=dict(mesos_framework_name=ns.mesos_framework_name))
@@ -57,7 +95,7 @@ def set_signals(mesos, relay, ns):
                 'could not terminate mesos scheduler',
                 extra=dict(mesos_framework_name=ns.mesos_framework_name))
         try:
-            relay.terminate()
+            kill_process_group(relay)
             log.info(
                 'terminated relay',
                 extra=dict(mesos_framework_name=ns.mesos_framework_name))
@@ -70,19 +108,27 @@ def set_signals(mesos, relay, ns):
     signal.signal(signal.SIGINT, kill_children)
 
 
+def reset_signals():
+    """Undo set_signals(...) in a child process"""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+
+
 def main(ns):
     """
     Run Relay as a Mesos framework.
     Relay's event loop and the Mesos scheduler each run in separate processes
-    and communicate through a multiprocessing.Pipe.
+    and communicate through a multiprocessing.Queue.
 
     These two processes bounce control back and forth between mesos
     resourceOffers and Relay's warmer/cooler functions.  Relay warmer/cooler
     functions request that mesos tasks get spun up, but those requests are only
     filled if the mesos scheduler receives enough relevant offers.  Relay's
-    requests don't build up: only the largest request since the last fulfilled
-    request is fulfilled at moment enough mesos resources are available.
+    requests don't build up: only the most recent request is fulfilled at the
+    moment enough mesos resources are available.
     """
+    # the parent "relay" logger will not propagate
+    configure_logging(True, log=logging.getLogger('relay'))
     if ns.mesos_master is None:
         log.error(
             "Oops!  You didn't define --mesos_master",
@@ -98,42 +144,62 @@ def main(ns):
         "Starting Relay Mesos!",
         extra={k: str(v) for k, v in ns.__dict__.items()})
 
-    # a distributed value storing the num and type of tasks mesos scheduler
-    # should create at any given moment in time.
-    # Sign of MV determines task type: warmer or cooler
-    # ie. A positive value of n means n warmer tasks
-    MV = mp.Array('d', [0, 0])  # max_val is a ctypes.c_int64
+    # a queue of requests for the num and type of tasks mesos scheduler
+    # should create.  Relay only puts and the scheduler only gets, so neither
+    # process waits on a lock held by the other.
+    # Requests are tuples of (task_type, num_tasks)
+    # ie. ("warmer", 3) means 3 warmer tasks
+    MV = mp.Queue()
 
-    # store exceptions that may be raised
-    exception_receiver, exception_sender = mp.Pipe(False)
+    # store exceptions that may be raised.  Unlike a Pipe, put() never blocks
+    # a child, however large the exception is
+    exceptions = mp.Queue()
     # notify relay when mesos framework is ready
-    mesos_ready = mp.Condition()
+    mesos_ready = mp.Event()
 
     # copy and then override warmer and cooler
-    ns_relay = ns.__class__(**{k: v for k, v in ns.__dict__.items()})
+    ns_relay = copy.copy(ns)
     if ns.warmer:
-        ns_relay.warmer = warmer_cooler_wrapper(MV, ns)
+        ns_relay.warmer = warmer_cooler_wrapper(MV, ns, "warmer")
     if ns.cooler:
-        ns_relay.cooler = warmer_cooler_wrapper(MV, ns)
+        ns_relay.cooler = warmer_cooler_wrapper(MV, ns, "cooler")
 
     mesos_name = "Relay.Mesos Scheduler"
     mesos = mp.Process(
-        target=catch(init_mesos_scheduler, exception_sender),
-        kwargs=dict(ns=ns, MV=MV, exception_sender=exception_sender,
+        target=catch(init_mesos_scheduler, exceptions),
+        kwargs=dict(ns=ns, MV=MV, exception_sender=exceptions,
                     mesos_ready=mesos_ready),
         name=mesos_name)
     relay_name = "Relay.Runner Event Loop"
     relay = mp.Process(
-        target=catch(init_relay, exception_sender),
+        target=catch(init_relay, exceptions),
         args=(ns_relay, mesos_ready, ns.mesos_framework_name),
         name=relay_name)
+    # set signals first so a signal during startup cannot orphan a child
+    set_signals(mesos, relay, ns)
     mesos.start()  # start mesos framework
     relay.start()  # start relay's loop
-    set_signals(mesos, relay, ns)
 
+    # block until a child sends an exception.  The timeout is only there to
+    # notice children that die without telling us (ie SIGKILL), so it doesn't
+    # need to follow Relay's --delay.
     while True:
-        if exception_receiver.poll():
-            exception_receiver.recv()
+        try:
+            raised = [exceptions.get(timeout=5)]
+        except Queue.Empty:
+            pass
+        else:
+            # both children may have raised.  Don't leave any behind
+            while True:
+                try:
+                    raised.append(exceptions.get_nowait())
+                except Queue.Empty:
+                    break
+            for process_name, tb in raised:
+                log.error(
+                    'A child process raised an exception', extra=dict(
+                        process_name=process_name, traceback=tb,
+                        mesos_framework_name=ns.mesos_framework_name))
             log.error(
                 'Terminating child processes because one of them raised'
                 ' an exception', extra=dict(
@@ -152,22 +218,18 @@ def main(ns):
                 "  This may be a code bug.  Check logs.",
                 extra=dict(mesos_framework_name=ns.mesos_framework_name))
             break
-        # save cpu cycles by checking for subprocess failures less often
-        if ns.delay > 5:
-            time.sleep(5)
-        else:
-            time.sleep(ns.delay)
 
-    relay.terminate()
-    mesos.terminate()
+    kill_process_group(relay)
+    kill_process_group(mesos)
     sys.exit(1)
 
 
 def init_relay(ns_relay, mesos_ready, mesos_framework_name):
+    os.setpgrp()  # so kill_process_group also reaches relay's children
+    reset_signals()
     log.debug(
         'Relay waiting to start until mesos framework is registered',
         extra=dict(mesos_framework_name=mesos_framework_name))
-    mesos_ready.acquire()
     mesos_ready.wait()
     log.debug(
         'Relay notified that mesos framework is registered',
@@ -176,16 +238,14 @@ def init_relay(ns_relay, mesos_ready, mesos_framework_name):
 
 
 def init_mesos_scheduler(ns, MV, exception_sender, mesos_ready):
-    import mesos.interface
-    from mesos.interface import mesos_pb2
-    try:
-        import mesos.native
-    except ImportError:
+    os.setpgrp()  # so kill_process_group also reaches the driver's children
+    reset_signals()
+    if MESOS_NATIVE_IMPORT_ERROR is not None:
         log.error(
             "Oops! Mesos native bindings are not installed.  You can download"
             " these binaries from mesosphere.",
             extra=dict(mesos_framework_name=ns.mesos_framework_name))
-        raise
+        raise MESOS_NATIVE_IMPORT_ERROR
 
     log.info(
         'starting mesos scheduler',
@@ -224,6 +284,18 @@ add_argument = at.add_argument_default_from_env_factory(
     env_prefix='RELAY_MESOS_')
 
 
+def parse_task_resources(x):
+    """
+    Parse a comma or space separated list of resources into a dict.
+    ie. "cpus=10,mem=30000" --> {"cpus": "10", "mem": "30000"}
+    An empty string (ie. an empty RELAY_MESOS_TASK_RESOURCES) gives {}
+    """
+    return dict(
+        y.split('=', 1) for y in x.replace(' ', ',').split(',') if y)
+
+
+# at.build_arg_parser builds the parser once, right here, and returns a
+# function that returns that same parser on every call
 build_arg_parser = at.build_arg_parser([
     at.group(
         "How does Relay.mesos affect your metric?",
@@ -262,9 +334,7 @@ build_arg_parser = at.build_arg_parser([
                 " means that tasks spun up by Relay.Mesos will survive even if"
                 " this Relay.Mesos instance dies.")),
         at.add_argument(
-            '--mesos_task_resources',
-            type=lambda x: dict(
-                y.split('=') for y in x.replace(' ', ',').split(',')),
+            '--mesos_task_resources', type=parse_task_resources,
             default={}, help=(
                 "Specify what resources your task needs to execute.  These"
                 " can be any recognized mesos resource and must be specified"
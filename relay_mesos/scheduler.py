@@ -1,7 +1,7 @@
 from __future__ import division
 import random
-import time
 import sys
+import threading
 
 import mesos.interface
 from mesos.interface import mesos_pb2
@@ -126,7 +126,7 @@ def create_tasks(MV, available_offers, driver, command, ns):
 
 
 def _create_task_add_task_resources(task, ns):
-    task_resources = dict(ns.mesos_task_resources)
+    task_resources = ns.mesos_task_resources
     seen = set()
     for key in set(SCALAR_KEYS).intersection(task_resources):
         seen.add(key)
@@ -234,10 +234,31 @@ class Scheduler(mesos.interface.Scheduler):
     def __init__(self, MV, exception_sender, mesos_ready, ns):
         self.ns = ns
         self.MV = MV
+        # relay's latest request, less tasks created since
+        self.requested = ("warmer", 0)
+        self.requested_lock = threading.Lock()
         self.mesos_ready = mesos_ready
         self.exception_sender = exception_sender
         self.failures = 0
 
+        watcher = threading.Thread(
+            target=catch(self._watch_relay_requests, exception_sender),
+            name="relay request watcher")
+        watcher.daemon = True
+        watcher.start()
+
+    def _watch_relay_requests(self):
+        """
+        Replace self.requested with each request Relay sends, as soon as it
+        arrives.  Draining the queue here, rather than when usable offers
+        arrive, keeps Relay's requests from piling up while mesos sends no
+        usable offers.
+        """
+        while True:
+            request = self.MV.get()
+            with self.requested_lock:
+                self.requested = request
+
     def registered(self, driver, frameworkId, masterInfo):
         """
         Invoked when the scheduler re-registers with a newly elected Mesos
@@ -251,9 +272,7 @@ class Scheduler(mesos.interface.Scheduler):
             driver, frameworkId, masterInfo)
 
     def _registered(self, driver, frameworkId, masterInfo):
-        self.mesos_ready.acquire()
-        self.mesos_ready.notify()
-        self.mesos_ready.release()
+        self.mesos_ready.set()
 
         log.info(
             "Registered with master", extra=dict(
@@ -295,7 +314,7 @@ class Scheduler(mesos.interface.Scheduler):
             num_offers=len(offers),
             mesos_framework_name=self.ns.mesos_framework_name))
         available_offers, decline_offers = filter_offers(
-            offers, dict(self.ns.mesos_task_resources))
+            offers, self.ns.mesos_task_resources)
         for offer in decline_offers:
             driver.declineOffer(offer.id)
         if not available_offers:
@@ -308,52 +327,41 @@ class Scheduler(mesos.interface.Scheduler):
                 available_offers=len(available_offers),
                 max_runnable_tasks=sum(x[1] for x in available_offers),
                 mesos_framework_name=self.ns.mesos_framework_name))
-        MV, command = self._get_and_update_relay(available_offers)
+        request = self._get_relay_request()
+        task_type, MV = request
+        command = getattr(self.ns, task_type) if MV else None
 
         if command is None:
             for offer, _ in available_offers:
                 driver.declineOffer(offer.id)
             return
-        create_tasks(
-            MV=abs(MV), available_offers=available_offers,
+        n_fulfilled = create_tasks(
+            MV=MV, available_offers=available_offers,
             driver=driver, command=command, ns=self.ns
         )
+        # whatever these offers couldn't fit waits for the next offers,
+        # unless Relay sent a newer request in the meantime
+        with self.requested_lock:
+            if self.requested is request:
+                self.requested = (task_type, MV - n_fulfilled)
         driver.reviveOffers()
 
-    def _get_and_update_relay(self, available_offers):
+    def _get_relay_request(self):
         """
-        Get num tasks I should create and evaluate whether to use Relay's
-        warmer or cooler command.  Update the MV with number of commands about
-        to be created.
+        Get num tasks I should create and whether to use Relay's warmer or
+        cooler command, as a tuple: (task_type, num_tasks)
 
-        Competes for the MV with these other threads, and will wait
-        indefinitely for it:
-
-          - other Mesos resourceOffers(...) calls to the Framework scheduler
-          - Relay warmer and cooler functions attempting to ask the Framework
-            to execute more tasks.
+        Requests don't build up: the most recent request replaces any older
+        ones, including what is left of a partially fulfilled request.
         """
-        command = None
-        with self.MV.get_lock():
-            MV, t = self.MV
-            # create tasks that fulfill relay's requests or return
-            if MV == 0:
-                log.debug(
-                    'mesos scheduler has received no requests from relay',
-                    extra=dict(
-                        mesos_framework_name=self.ns.mesos_framework_name))
-            else:
-                if MV > 0 and self.ns.warmer:
-                    command = self.ns.warmer
-                elif MV < 0 and self.ns.cooler:
-                    command = self.ns.cooler
-                if abs(MV) < len(available_offers):
-                    self.MV[:] = [0, time.time()]
-                else:
-                    new_MV = MV - (MV > 0 or -1) * max(abs(MV),
-                                                       len(available_offers))
-                    self.MV[:] = [new_MV, time.time()]
-        return (MV, command)
+        with self.requested_lock:
+            task_type, MV = request = self.requested
+        if MV == 0:
+            log.debug(
+                'mesos scheduler has received no requests from relay',
+                extra=dict(
+                    mesos_framework_name=self.ns.mesos_framework_name))
+        return request
 
     def statusUpdate(self, driver, update):
         catch(self._statusUpdate, self.exception_sender)(driver, update)
@@ -1,16 +1,27 @@
+import multiprocessing
+import traceback
+
 from relay_mesos import log
 
 
+# only the end of a long traceback is sent.  It contains the exception message
+MAX_TRACEBACK_LEN = 2048
+
+
 def catch(func, exception_sender):
     """Closure that calls given func.  If an error is raised, send it somewhere
 
     `func` function to call
-    `exception_sender` a writable end of a multiprocessing.Pipe
+    `exception_sender` a multiprocessing.Queue.  It receives a tuple,
+        (process name, formatted traceback), rather than the exception, which
+        may be large or may not unpickle in the receiving process
     """
     def f(*args, **kwargs):
         try:
             func(*args, **kwargs)
         except Exception as e:
             log.exception(e)
-            exception_sender.send(e)
+            exception_sender.put((
+                multiprocessing.current_process().name,
+                traceback.format_exc()[-MAX_TRACEBACK_LEN:]))
     return f